@@ -2,9 +2,12 @@
 from __future__ import annotations
 
 import asyncio
+import shutil
 
+from .browser import close_bounded, is_owned_profile, new_run_id, owner_tag, reap_browsers, start_playwright
 from .config import AppConfig
 from .history import HistoryEntry, HistoryLogger
+from .session import save_storage_state
 from .utils import now_local, wait_for_input
 
 
@@ -13,23 +16,29 @@ def _format_timestamp(config: AppConfig) -> str:
 
 
 async def _authorize_async(config: AppConfig, history: HistoryLogger) -> None:
-    from playwright.async_api import async_playwright  # Imported lazily
-
     timestamp = _format_timestamp(config)
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=False, slow_mo=config.playwright.slow_mo_ms)
-        context = await browser.new_context()
-        page = await context.new_page()
-        print("Opening AnyRouter for manual GitHub authorization...")
-        await page.goto(config.playwright.base_url, wait_until="load")
-        print(
-            "Complete the authorization in the browser window. "
-            "When the AnyRouter dashboard is visible, return to this terminal."
-        )
-        await wait_for_input("Press ENTER to capture the session once authorization is completed...")
-        await context.storage_state(path=str(config.playwright.storage_state_path))
-        await browser.close()
-        print(f"Authorization stored to {config.playwright.storage_state_path}")
+    run_id = new_run_id()
+    close_timeout_ms = config.playwright.close_timeout_ms
+    reap_browsers()
+    async with asyncio.timeout(config.playwright.authorize_timeout_ms / 1000):
+        async with start_playwright(close_timeout_ms, run_id) as p:
+            browser = await p.chromium.launch(
+                headless=False, slow_mo=config.playwright.slow_mo_ms, args=[owner_tag(run_id)]
+            )
+            try:
+                context = await browser.new_context()
+                page = await context.new_page()
+                print("Opening AnyRouter for manual GitHub authorization...")
+                await page.goto(config.playwright.base_url, wait_until="load")
+                print(
+                    "Complete the authorization in the browser window. "
+                    "When the AnyRouter dashboard is visible, return to this terminal."
+                )
+                await wait_for_input("Press ENTER to capture the session once authorization is completed...")
+                save_storage_state(config.playwright.storage_state_path, await context.storage_state())
+            finally:
+                await close_bounded(browser.close(), close_timeout_ms, run_id)
+            print(f"Authorization stored to {config.playwright.storage_state_path}")
 
     history.append(
         HistoryEntry(
@@ -45,7 +54,11 @@ async def _authorize_async(config: AppConfig, history: HistoryLogger) -> None:
 def authorize(config: AppConfig, history: HistoryLogger) -> None:
     """Run the manual authorization flow."""
 
-    asyncio.run(_authorize_async(config, history))
+    try:
+        asyncio.run(_authorize_async(config, history))
+    except TimeoutError as exc:
+        timeout_s = config.playwright.authorize_timeout_ms // 1000
+        raise SystemExit(f"Authorization was not completed within {timeout_s}s") from exc
 
 
 def revoke(config: AppConfig, history: HistoryLogger) -> None:
@@ -53,6 +66,13 @@ def revoke(config: AppConfig, history: HistoryLogger) -> None:
 
     storage_path = config.playwright.storage_state_path
     timestamp = _format_timestamp(config)
+    profile_dir = config.playwright.profile_dir
+    if profile_dir is not None and profile_dir.exists():
+        if is_owned_profile(profile_dir):
+            shutil.rmtree(profile_dir, ignore_errors=True)
+            print(f"Removed browser profile {profile_dir}")
+        else:
+            print(f"Not removing {profile_dir}: it is not a browser profile created by this tool")
     if storage_path.exists():
         storage_path.unlink()
         print(f"Removed {storage_path}")
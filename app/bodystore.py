@@ -0,0 +1,63 @@
+"""Content-addressed storage for captured response bodies."""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from .utils import atomic_write_bytes
+
+
+class BodyStore:
+    """Store gzip-compressed bodies once under their SHA-256 digest.
+
+    Identical bodies are deduplicated; the least recently written or reused
+    files are evicted once the store exceeds ``max_bytes``.
+    """
+
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, digest: str) -> Path:
+        return self.root / digest[:2] / f"{digest}.gz"
+
+    def put(self, data: bytes) -> str:
+        """Store ``data`` and return its hex digest."""
+
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path_for(digest)
+        if path.exists():
+            os.utime(path)
+        else:
+            atomic_write_bytes(path, gzip.compress(data))
+            self._evict(keep=path)
+        return digest
+
+    def get(self, digest: str) -> Optional[bytes]:
+        path = self.path_for(digest)
+        if not path.exists():
+            return None
+        return gzip.decompress(path.read_bytes())
+
+    def _evict(self, keep: Path) -> None:
+        if self.max_bytes <= 0:
+            return
+        files: List[Tuple[float, int, Path]] = []
+        for path in self.root.glob("*/*.gz"):
+            stat = path.stat()
+            files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                path.unlink()
+            except OSError:  # pragma: no cover - concurrent eviction
+                continue
+            total -= size
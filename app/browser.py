@@ -0,0 +1,298 @@
+"""Browser context helpers for the sign-in workflow."""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import signal
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Dict, List, Optional, Set, Tuple
+
+from .config import ConfigError, PlaywrightConfig
+
+
+MIB = 1024 * 1024
+
+# Cache directories Chromium keeps inside a persistent profile.
+CACHE_SUBDIRS = ("Default/Cache", "Default/Code Cache", "Default/GPUCache")
+
+# Chromium ignores unknown switches, so launched browsers carry the owning
+# process id and start time; the reaper uses it to find leftovers.
+OWNER_FLAG = "--auto-loggin-owner="
+
+# Seeds localStorage once per tab and origin: sessionStorage survives reloads
+# and navigations within the tab, so values the site rotates afterwards are
+# not overwritten with the stale copy from storage_state.json.
+_LOCAL_STORAGE_SCRIPT = """
+(origins => {
+  const entries = origins[window.location.origin];
+  if (!entries) return;
+  const flag = "__auto_loggin_seeded__";
+  try {
+    if (window.sessionStorage.getItem(flag)) return;
+    window.sessionStorage.setItem(flag, "1");
+  } catch (e) {
+    return;
+  }
+  for (const [name, value] of entries) {
+    try { window.localStorage.setItem(name, value); } catch (e) {}
+  }
+})(%s);
+"""
+
+
+@dataclass
+class CacheStats:
+    """Counts responses served from the browser disk cache."""
+
+    hit_requests: int = 0
+    hit_bytes: int = 0
+    _pending: Set[str] = field(default_factory=set, repr=False)
+
+    def on_response(self, params: dict) -> None:
+        response = params.get("response") or {}
+        if response.get("fromDiskCache"):
+            self.hit_requests += 1
+            self._pending.add(params.get("requestId", ""))
+
+    def on_data(self, params: dict) -> None:
+        if params.get("requestId") in self._pending:
+            self.hit_bytes += int(params.get("dataLength", 0))
+
+    def on_finished(self, params: dict) -> None:
+        self._pending.discard(params.get("requestId", ""))
+
+
+def _proc_start_time(pid: int) -> Optional[str]:
+    try:
+        stat = Path(f"/proc/{pid}/stat").read_text()
+    except OSError:
+        return None
+    # Field 22 (starttime); the command name in field 2 may contain spaces.
+    return stat.rsplit(")", 1)[-1].split()[19]
+
+
+def new_run_id() -> str:
+    """Return an identifier distinguishing concurrent runs inside one process."""
+
+    return uuid.uuid4().hex[:12]
+
+
+def owner_tag(run_id: str) -> str:
+    """Return the switch identifying browsers launched by run ``run_id`` of this process."""
+
+    pid = os.getpid()
+    return f"{OWNER_FLAG}{pid}:{_proc_start_time(pid) or 0}:{run_id}"
+
+
+def _list_processes() -> Dict[int, Tuple[int, List[str]]]:
+    processes: Dict[int, Tuple[int, List[str]]] = {}
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+            cmdline = (entry / "cmdline").read_bytes().decode(errors="replace").split("\0")
+        except OSError:
+            continue
+        processes[int(entry.name)] = (int(stat.rsplit(")", 1)[-1].split()[1]), cmdline)
+    return processes
+
+
+def reap_browsers(*, own_run: Optional[str] = None) -> List[int]:
+    """Kill browser process trees whose owning process is gone.
+
+    With ``own_run`` the browsers launched by that run of the current process
+    are killed too; used when a browser refuses to close within its deadline.
+    Only supported where ``/proc`` is available; elsewhere this is a no-op.
+
+    Returns:
+        Killed process ids.
+    """
+
+    if not Path("/proc").is_dir():
+        return []
+    processes = _list_processes()
+    own_pid = os.getpid()
+    roots: Set[int] = set()
+    for pid, (_, cmdline) in processes.items():
+        for arg in cmdline:
+            if not arg.startswith(OWNER_FLAG):
+                continue
+            owner, _, rest = arg[len(OWNER_FLAG) :].partition(":")
+            started, _, run_id = rest.partition(":")
+            if not owner.isdigit():
+                break
+            owner_pid = int(owner)
+            if owner_pid == own_pid:
+                if own_run is not None and run_id == own_run:
+                    roots.add(pid)
+            elif _proc_start_time(owner_pid) != started:
+                roots.add(pid)
+            break
+
+    children: Dict[int, List[int]] = {}
+    for pid, (ppid, _) in processes.items():
+        children.setdefault(ppid, []).append(pid)
+    victims: Set[int] = set()
+    stack = list(roots)
+    while stack:
+        pid = stack.pop()
+        if pid in victims:
+            continue
+        victims.add(pid)
+        stack.extend(children.get(pid, []))
+
+    for pid in victims:
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except OSError:
+            continue
+    return sorted(victims)
+
+
+async def close_bounded(closing: Awaitable[Any], timeout_ms: int, run_id: str) -> None:
+    """Await a browser/driver shutdown, killing the run's browsers if it hangs or fails."""
+
+    try:
+        await asyncio.wait_for(closing, timeout_ms / 1000)
+    except Exception:
+        killed = reap_browsers(own_run=run_id)
+        print(f"Browser did not close cleanly; killed {len(killed)} process(es)")
+
+
+@asynccontextmanager
+async def start_playwright(close_timeout_ms: int, run_id: str) -> AsyncIterator[Any]:
+    """Start the Playwright driver and stop it within ``close_timeout_ms``.
+
+    Unlike ``async with async_playwright()``, a driver that hangs while
+    stopping (e.g. after a cancelled run) cannot block the caller forever.
+    """
+
+    from playwright.async_api import async_playwright  # Imported lazily
+
+    playwright = await async_playwright().start()
+    try:
+        yield playwright
+    finally:
+        await close_bounded(playwright.stop(), close_timeout_ms, run_id)
+
+
+PROFILE_MARKER = ".auto_loggin_profile"
+
+
+def is_owned_profile(profile_dir: Path) -> bool:
+    """Return ``True`` if ``profile_dir`` was created and marked by this tool."""
+
+    return (profile_dir / PROFILE_MARKER).is_file()
+
+
+def claim_profile_dir(profile_dir: Path) -> None:
+    """Mark ``profile_dir`` as a tool-owned profile, refusing non-empty foreign directories."""
+
+    if is_owned_profile(profile_dir):
+        return
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    if any(profile_dir.iterdir()):
+        raise ConfigError(
+            f"playwright.profile_dir {profile_dir} is not empty and was not created by this tool; "
+            "point it at a new directory"
+        )
+    (profile_dir / PROFILE_MARKER).write_text("Browser profile managed by auto_loggin\n", encoding="utf-8")
+
+
+def prune_cache(profile_dir: Path, max_bytes: int) -> int:
+    """Delete the oldest cache files until the profile cache fits ``max_bytes``.
+
+    Returns:
+        Number of bytes removed.
+    """
+
+    files: List[Tuple[float, int, Path]] = []
+    for subdir in CACHE_SUBDIRS:
+        root = profile_dir / subdir
+        if not root.is_dir():
+            continue
+        for path in root.rglob("*"):
+            if path.is_file():
+                stat = path.stat()
+                files.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in files)
+    removed = 0
+    for _, size, path in sorted(files):
+        if total - removed <= max_bytes:
+            break
+        try:
+            path.unlink()
+        except OSError:  # pragma: no cover - file vanished or locked
+            continue
+        removed += size
+    return removed
+
+
+async def apply_storage_state(context: Any, storage_path: Path) -> None:
+    """Load cookies and localStorage from ``storage_state.json`` into ``context``."""
+
+    state = json.loads(storage_path.read_text(encoding="utf-8"))
+    cookies = state.get("cookies") or []
+    if cookies:
+        await context.add_cookies(cookies)
+    origins = {
+        origin["origin"]: [(item["name"], item["value"]) for item in origin.get("localStorage", [])]
+        for origin in state.get("origins") or []
+        if origin.get("origin")
+    }
+    if origins:
+        await context.add_init_script(_LOCAL_STORAGE_SCRIPT % json.dumps(origins))
+
+
+async def track_cache_hits(context: Any, page: Any) -> CacheStats:
+    """Attach a CDP listener to ``page`` that accumulates disk cache hits."""
+
+    stats = CacheStats()
+    session = await context.new_cdp_session(page)
+    session.on("Network.responseReceived", stats.on_response)
+    session.on("Network.dataReceived", stats.on_data)
+    session.on("Network.loadingFinished", stats.on_finished)
+    await session.send("Network.enable")
+    return stats
+
+
+@asynccontextmanager
+async def open_signin_context(playwright: Any, config: PlaywrightConfig, run_id: str) -> AsyncIterator[Any]:
+    """Yield a browser context carrying the stored session.
+
+    Without ``profile_dir`` an ephemeral context is created from
+    ``storage_state.json``. With ``profile_dir`` a persistent Chromium profile
+    is reused so the HTTP and disk caches survive between runs; the session is
+    loaded from ``storage_state.json`` on every launch.
+    """
+
+    if config.profile_dir is None:
+        browser = await playwright.chromium.launch(
+            headless=config.headless, slow_mo=config.slow_mo_ms, args=[owner_tag(run_id)]
+        )
+        try:
+            yield await browser.new_context(storage_state=str(config.storage_state_path))
+        finally:
+            await close_bounded(browser.close(), config.close_timeout_ms, run_id)
+        return
+
+    claim_profile_dir(config.profile_dir)
+    max_bytes = config.cache_max_mb * MIB
+    prune_cache(config.profile_dir, max_bytes)
+    context = await playwright.chromium.launch_persistent_context(
+        str(config.profile_dir),
+        headless=config.headless,
+        slow_mo=config.slow_mo_ms,
+        args=[f"--disk-cache-size={max_bytes}", owner_tag(run_id)],
+    )
+    try:
+        await apply_storage_state(context, config.storage_state_path)
+        yield context
+    finally:
+        await close_bounded(context.close(), config.close_timeout_ms, run_id)
@@ -2,12 +2,18 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
+import time
+from datetime import timedelta
 from pathlib import Path
-from typing import Callable, Optional
+from typing import Callable, Optional, Set
 
-from . import auth, runner
-from .config import AppConfig, ConfigError, load_config
-from .history import HistoryLogger
+from . import auth, runner, scheduler, signin
+from .bodystore import BodyStore
+from .browser import MIB
+from .config import AppConfig, ConfigError, ConfigWatcher, load_config
+from .history import AsyncHistoryWriter, HistoryLogger
+from .utils import now_local
 
 
 def _load_config(path: Optional[Path]) -> AppConfig:
@@ -18,7 +24,13 @@ def _load_config(path: Optional[Path]) -> AppConfig:
 
 
 def _build_history(config: AppConfig) -> HistoryLogger:
-    return HistoryLogger(config.history.csv_path, max_rows=config.history.max_rows)
+    return HistoryLogger(
+        config.history.csv_path,
+        max_rows=config.history.max_rows,
+        retention_days=config.history.retention_days,
+        rollup_path=config.history.rollup_path,
+        daily_state_path=config.history.daily_state_path,
+    )
 
 
 def cmd_authorize(args: argparse.Namespace) -> None:
@@ -31,12 +43,14 @@ def cmd_signin(args: argparse.Namespace) -> None:
     cfg = _load_config(args.config)
     history = _build_history(cfg)
     run = runner.Runner(cfg, history)
-    outcome = run.call_signin(args.slot)
+    outcome = run.call_signin(args.slot, force=args.force)
     print(f"Sign-in result: {outcome.status} - {outcome.message}")
     if outcome.err_category:
         print(f"Category: {outcome.err_category}")
     if outcome.http_status:
         print(f"HTTP status: {outcome.http_status}")
+    if outcome.cache_hit_bytes is not None:
+        print(f"Cache hit bytes: {outcome.cache_hit_bytes}")
 
 
 def cmd_revoke(args: argparse.Namespace) -> None:
@@ -48,6 +62,12 @@ def cmd_revoke(args: argparse.Namespace) -> None:
 def cmd_status(args: argparse.Namespace) -> None:
     cfg = _load_config(args.config)
     history = _build_history(cfg)
+    today = history.day_status(now_local(cfg.schedule.timezone).date().isoformat())
+    if today is not None:
+        print(
+            f"Today ({today.date}): first_success={today.first_success_time or '-'} "
+            f"fail_count={today.fail_count} last_result={today.last_result or '-'}"
+        )
     entries = history.tail(args.last)
     if not entries:
         print("No history entries yet")
@@ -59,6 +79,117 @@ def cmd_status(args: argparse.Namespace) -> None:
         )
 
 
+def cmd_stats(args: argparse.Namespace) -> None:
+    cfg = _load_config(args.config)
+    history = _build_history(cfg)
+    today = now_local(cfg.schedule.timezone).date()
+    since = (today - timedelta(days=args.days - 1)).isoformat() if args.days > 0 else None
+    rollups = history.stats(since=since)
+    if not rollups:
+        print("No history entries yet")
+        return
+    for rollup in rollups:
+        results = ", ".join(f"{name}={count}" for name, count in sorted(rollup.results.items())) or "-"
+        errors = ", ".join(f"{name}={count}" for name, count in sorted(rollup.err_categories.items())) or "-"
+        avg = rollup.duration_avg_ms
+        latency = (
+            f"avg={avg}ms min={rollup.duration_min_ms}ms max={rollup.duration_max_ms}ms" if avg is not None else "-"
+        )
+        print(
+            f"[{rollup.day}] slot={rollup.slot or '-'} stage={rollup.stage} runs={rollup.count} "
+            f"results={results} err={errors} latency={latency}"
+        )
+
+
+def cmd_compact(args: argparse.Namespace) -> None:
+    cfg = _load_config(args.config)
+    history = _build_history(cfg)
+    if history.rollup_path is None:
+        raise SystemExit("history.rollup_path must be configured to compact history")
+    removed = history.compact(
+        now_local(cfg.schedule.timezone).date(), fsync=cfg.history.durability == "fsync"
+    )
+    print(f"Compacted {removed} history rows into {history.rollup_path}")
+
+
+async def _serve(watcher: ConfigWatcher, interval: float) -> None:
+    """Run due slots as tasks sharing one history writer until cancelled."""
+
+    cfg = watcher.current
+    run = runner.Runner(cfg, _build_history(cfg))
+    writer = signin.new_history_writer(cfg, run.history)
+    running: Set[asyncio.Task] = set()
+
+    async def _run_slot(slot: str, slot_writer: AsyncHistoryWriter) -> None:
+        deadline = time.monotonic() + run.config.schedule.slot_timeout_ms / 1000
+        outcome = await run.call_signin_async(slot, slot_writer, deadline=deadline)
+        print(f"[{slot}] Sign-in result: {outcome.status} - {outcome.message}")
+
+    def action_factory(slot: str) -> Callable[[], None]:
+        def _action() -> None:
+            task = asyncio.get_running_loop().create_task(_run_slot(slot, writer))
+            running.add(task)
+            task.add_done_callback(running.discard)
+
+        return _action
+
+    jobs = scheduler.create_jobs(cfg.schedule.slots, action_factory, now=now_local(cfg.schedule.timezone))
+    print(f"Scheduler started with slots: {', '.join(sorted(jobs)) or '-'}")
+    writer.start()
+    writer.install_signal_handlers(asyncio.current_task())
+    try:
+        while True:
+            change = watcher.poll()
+            if watcher.last_error is not None:
+                print(f"Config reload rejected, keeping previous version: {watcher.last_error}")
+                watcher.last_error = None
+            if change is not None:
+                if "history" in change.sections:
+                    # Runs in flight still hold the old writer; let them finish first.
+                    await asyncio.gather(*running, return_exceptions=True)
+                    await writer.close()
+                    run.history = _build_history(change.new)
+                    writer = signin.new_history_writer(change.new, run.history)
+                    writer.start()
+                    writer.install_signal_handlers(asyncio.current_task())
+                run.config = change.new
+                if "schedule" in change.sections:
+                    added, removed = scheduler.sync_jobs(
+                        jobs, change.new.schedule.slots, action_factory, now=now_local(change.new.schedule.timezone)
+                    )
+                    print(f"Schedule reloaded: added={added or '-'} removed={removed or '-'}")
+                print(f"Config reloaded: {', '.join(sorted(change.sections))}")
+            scheduler.run_pending(jobs, now_local(run.config.schedule.timezone))
+            await asyncio.sleep(interval)
+    finally:
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        await writer.close()
+
+
+def cmd_schedule(args: argparse.Namespace) -> None:
+    try:
+        watcher = ConfigWatcher(args.config)
+    except ConfigError as exc:
+        raise SystemExit(str(exc)) from exc
+    try:
+        asyncio.run(_serve(watcher, args.interval))
+    except asyncio.CancelledError as exc:
+        raise SystemExit("Scheduler stopped; pending history rows were flushed") from exc
+
+
+def cmd_body(args: argparse.Namespace) -> None:
+    cfg = _load_config(args.config)
+    store_dir = cfg.history.body_store_dir
+    if store_dir is None:
+        raise SystemExit("history.body_store_dir is not configured")
+    data = BodyStore(store_dir, cfg.history.body_store_max_mb * MIB).get(args.digest)
+    if data is None:
+        raise SystemExit(f"No stored body for {args.digest}")
+    print(data.decode("utf-8", errors="replace"))
+
+
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Automate AnyRouter sign-in via Playwright")
     parser.add_argument("--config", type=Path, default=None, help="Path to config.toml")
@@ -70,6 +201,9 @@ def build_parser() -> argparse.ArgumentParser:
 
     sub_signin = subparsers.add_parser("signin", help="Trigger a sign-in attempt")
     sub_signin.add_argument("--slot", default="morning", help="Slot name (morning/noon/evening)")
+    sub_signin.add_argument(
+        "--force", action="store_true", help="Run even if today's sign-in is already recorded as successful"
+    )
     sub_signin.set_defaults(func=cmd_signin)
 
     sub_revoke = subparsers.add_parser("revoke", help="Clear stored authorization state")
@@ -79,6 +213,21 @@ def build_parser() -> argparse.ArgumentParser:
     sub_status.add_argument("--last", type=int, default=20, help="Number of history records to display")
     sub_status.set_defaults(func=cmd_status)
 
+    sub_schedule = subparsers.add_parser("schedule", help="Run slots in-process and hot-reload config.toml")
+    sub_schedule.add_argument("--interval", type=float, default=30.0, help="Polling interval in seconds")
+    sub_schedule.set_defaults(func=cmd_schedule)
+
+    sub_stats = subparsers.add_parser("stats", help="Display per-day history statistics")
+    sub_stats.add_argument("--days", type=int, default=30, help="Number of days to include (0 for all)")
+    sub_stats.set_defaults(func=cmd_stats)
+
+    sub_compact = subparsers.add_parser("compact", help="Fold expired history rows into daily rollups")
+    sub_compact.set_defaults(func=cmd_compact)
+
+    sub_body = subparsers.add_parser("body", help="Print a stored response body by its SHA-256 digest")
+    sub_body.add_argument("digest", help="body_sha256 value from a history row")
+    sub_body.set_defaults(func=cmd_body)
+
     return parser
 
 
@@ -1,11 +1,15 @@
 """Application configuration loading utilities."""
 from __future__ import annotations
 
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
+from datetime import datetime
 from pathlib import Path
-from typing import Dict, Iterable, List, Mapping, MutableMapping, Optional, Sequence, Tuple
+from typing import Dict, FrozenSet, Iterable, List, Mapping, MutableMapping, Optional, Sequence, Tuple
+import hashlib
 import os
+import threading
 import tomllib
+import zoneinfo
 
 
 CONFIG_ENV_VAR = "AUTO_LOGGIN_CONFIG"
@@ -25,6 +29,14 @@ class PlaywrightConfig:
     headless: bool = True
     slow_mo_ms: int = 0
     launch_timeout_ms: int = 30000
+    profile_dir: Optional[Path] = None
+    cache_max_mb: int = 200
+    base_urls: Tuple[str, ...] = ()
+    mirror_stats_path: Optional[Path] = None
+    probe_timeout_ms: int = 5000
+    run_timeout_ms: int = 180000
+    close_timeout_ms: int = 10000
+    authorize_timeout_ms: int = 900000
 
 
 @dataclass
@@ -33,6 +45,7 @@ class ScheduleConfig:
 
     timezone: str
     slots: Mapping[str, str] = field(default_factory=dict)
+    slot_timeout_ms: int = 600000
 
 
 @dataclass
@@ -41,6 +54,16 @@ class HistoryConfig:
 
     csv_path: Path
     max_rows: int = 2000
+    retention_days: int = 0
+    rollup_path: Optional[Path] = None
+    writer_queue_size: int = 1000
+    writer_batch_size: int = 50
+    writer_flush_interval_ms: int = 200
+    durability: str = "buffered"
+    body_max_bytes: int = 65536
+    body_store_dir: Optional[Path] = None
+    body_store_max_mb: int = 50
+    daily_state_path: Optional[Path] = None
 
 
 @dataclass
@@ -53,6 +76,7 @@ class DOMSelectors:
     success_keywords: Iterable[str] = field(default_factory=list)
     already_keywords: Iterable[str] = field(default_factory=list)
     failure_keywords: Iterable[str] = field(default_factory=list)
+    risk_keywords: Iterable[str] = field(default_factory=list)
 
 
 @dataclass
@@ -72,6 +96,17 @@ class SelectorConfig:
     api: APISelectors = field(default_factory=APISelectors)
 
 
+@dataclass
+class RateLimitConfig:
+    """Per-host token bucket applied to navigations and check-in calls."""
+
+    rate_per_sec: float = 0.5
+    burst: int = 3
+    backoff_seconds: float = 300.0
+    max_backoff_level: int = 4
+    state_path: Optional[Path] = None
+
+
 @dataclass
 class AppConfig:
     """Top level application configuration."""
@@ -80,6 +115,7 @@ class AppConfig:
     schedule: ScheduleConfig
     history: HistoryConfig
     selectors: SelectorConfig
+    ratelimit: RateLimitConfig = field(default_factory=RateLimitConfig)
 
 
 def _read_toml(path: Path) -> MutableMapping[str, object]:
@@ -101,34 +137,114 @@ def _resolve_path(value: str, *, base_dir: Path) -> Path:
 
 def _load_playwright_config(data: Mapping[str, object], *, base_dir: Path) -> PlaywrightConfig:
     try:
-        base_url = str(data["base_url"])  # type: ignore[index]
+        base_url_raw = data["base_url"]  # type: ignore[index]
         storage_state = _resolve_path(str(data["storage_state_path"]), base_dir=base_dir)
     except KeyError as exc:
         raise ConfigError("playwright.base_url and playwright.storage_state_path are required") from exc
 
+    if isinstance(base_url_raw, str):
+        base_urls: Tuple[str, ...] = (base_url_raw,)
+    elif isinstance(base_url_raw, Sequence):
+        base_urls = tuple(dict.fromkeys(str(item).strip() for item in base_url_raw if str(item).strip()))
+    else:
+        raise ConfigError("playwright.base_url must be a string or an array of strings")
+    if not base_urls:
+        raise ConfigError("playwright.base_url must contain at least one URL")
+    mirror_stats_path = _resolve_path(str(data.get("mirror_stats_path", "data/mirrors.json")), base_dir=base_dir)
+
+    profile_raw = data.get("profile_dir")
+    profile_dir = _resolve_path(str(profile_raw), base_dir=base_dir) if profile_raw else None
+    cache_max_mb = int(data.get("cache_max_mb", 200))
+    if cache_max_mb <= 0:
+        raise ConfigError("playwright.cache_max_mb must be positive")
+
     return PlaywrightConfig(
-        base_url=base_url,
+        base_url=base_urls[0],
         storage_state_path=storage_state,
         headless=bool(data.get("headless", True)),
         slow_mo_ms=int(data.get("slow_mo_ms", 0)),
         launch_timeout_ms=int(data.get("launch_timeout_ms", 30000)),
+        profile_dir=profile_dir,
+        cache_max_mb=cache_max_mb,
+        base_urls=base_urls,
+        mirror_stats_path=mirror_stats_path,
+        probe_timeout_ms=int(data.get("probe_timeout_ms", 5000)),
+        run_timeout_ms=int(data.get("run_timeout_ms", 180000)),
+        close_timeout_ms=int(data.get("close_timeout_ms", 10000)),
+        authorize_timeout_ms=int(data.get("authorize_timeout_ms", 900000)),
     )
 
 
 def _load_schedule_config(data: Mapping[str, object], *, base_dir: Path) -> ScheduleConfig:
     timezone = str(data.get("timezone", "Asia/Singapore"))
+    try:
+        zoneinfo.ZoneInfo(timezone)
+    except (zoneinfo.ZoneInfoNotFoundError, ValueError) as exc:
+        raise ConfigError(f"schedule.timezone is not a known IANA timezone: {timezone}") from exc
     slots_raw = data.get("slots", {})
     if not isinstance(slots_raw, Mapping):
         raise ConfigError("schedule.slots must be a mapping of slot name to trigger time")
-    slots: Dict[str, str] = {str(key): str(value) for key, value in slots_raw.items()}
-    return ScheduleConfig(timezone=timezone, slots=slots)
+    slots: Dict[str, str] = {}
+    for key, value in slots_raw.items():
+        try:
+            slots[str(key)] = datetime.strptime(str(value), "%H:%M").strftime("%H:%M")
+        except ValueError as exc:
+            raise ConfigError(f"schedule.slots.{key} must be a HH:MM time") from exc
+    slot_timeout_ms = int(data.get("slot_timeout_ms", 600000))
+    if slot_timeout_ms <= 0:
+        raise ConfigError("schedule.slot_timeout_ms must be positive")
+    return ScheduleConfig(timezone=timezone, slots=slots, slot_timeout_ms=slot_timeout_ms)
 
 
 def _load_history_config(data: Mapping[str, object], *, base_dir: Path) -> HistoryConfig:
     csv_path_raw = data.get("csv_path", "data/history.csv")
     csv_path = _resolve_path(str(csv_path_raw), base_dir=base_dir)
     max_rows = int(data.get("max_rows", 2000))
-    return HistoryConfig(csv_path=csv_path, max_rows=max_rows)
+    retention_days = int(data.get("retention_days", 0))
+    if retention_days < 0:
+        raise ConfigError("history.retention_days must be zero or positive")
+    rollup_raw = data.get("rollup_path")
+    rollup_path = _resolve_path(str(rollup_raw), base_dir=base_dir) if rollup_raw else None
+    durability = str(data.get("durability", "buffered"))
+    if durability not in ("buffered", "fsync"):
+        raise ConfigError("history.durability must be 'buffered' or 'fsync'")
+    body_store_raw = data.get("body_store_dir")
+    body_store_dir = _resolve_path(str(body_store_raw), base_dir=base_dir) if body_store_raw else None
+    body_max_bytes = int(data.get("body_max_bytes", 65536))
+    if body_max_bytes <= 0:
+        raise ConfigError("history.body_max_bytes must be positive")
+    daily_state_raw = data.get("daily_state_path", "data/daily_state.json")
+    daily_state_path = _resolve_path(str(daily_state_raw), base_dir=base_dir) if daily_state_raw else None
+    return HistoryConfig(
+        csv_path=csv_path,
+        max_rows=max_rows,
+        retention_days=retention_days,
+        rollup_path=rollup_path,
+        writer_queue_size=int(data.get("writer_queue_size", 1000)),
+        writer_batch_size=int(data.get("writer_batch_size", 50)),
+        writer_flush_interval_ms=int(data.get("writer_flush_interval_ms", 200)),
+        durability=durability,
+        body_max_bytes=body_max_bytes,
+        body_store_dir=body_store_dir,
+        body_store_max_mb=int(data.get("body_store_max_mb", 50)),
+        daily_state_path=daily_state_path,
+    )
+
+
+def _load_ratelimit_config(data: Mapping[str, object], *, base_dir: Path) -> RateLimitConfig:
+    state_raw = data.get("state_path", "data/ratelimit.json")
+    settings = RateLimitConfig(
+        rate_per_sec=float(data.get("rate_per_sec", 0.5)),
+        burst=int(data.get("burst", 3)),
+        backoff_seconds=float(data.get("backoff_seconds", 300.0)),
+        max_backoff_level=int(data.get("max_backoff_level", 4)),
+        state_path=_resolve_path(str(state_raw), base_dir=base_dir) if state_raw else None,
+    )
+    if settings.rate_per_sec < 0:
+        raise ConfigError("ratelimit.rate_per_sec must be zero (disabled) or positive")
+    if settings.burst < 1:
+        raise ConfigError("ratelimit.burst must be at least 1")
+    return settings
 
 
 def _load_selectors_config(data: Mapping[str, object]) -> SelectorConfig:
@@ -172,6 +288,7 @@ def _load_selectors_config(data: Mapping[str, object]) -> SelectorConfig:
         success_keywords=list(map(str, dom_raw.get("success_keywords", []))),
         already_keywords=list(map(str, dom_raw.get("already_keywords", []))),
         failure_keywords=list(map(str, dom_raw.get("failure_keywords", []))),
+        risk_keywords=list(map(str, dom_raw.get("risk_keywords", []))),
     )
 
     api = APISelectors(
@@ -185,6 +302,17 @@ def _load_selectors_config(data: Mapping[str, object]) -> SelectorConfig:
     return SelectorConfig(dom=dom, api=api)
 
 
+def resolve_config_path(path: Optional[Path] = None) -> Path:
+    """Return the configuration path from ``path``, the environment or the default."""
+
+    if path is not None:
+        return path
+    env_path = os.environ.get(CONFIG_ENV_VAR)
+    if env_path:
+        return Path(env_path)
+    return Path(DEFAULT_CONFIG_FILE)
+
+
 def load_config(path: Optional[Path] = None) -> AppConfig:
     """Load application configuration from TOML.
 
@@ -195,13 +323,7 @@ def load_config(path: Optional[Path] = None) -> AppConfig:
         Parsed :class:`AppConfig` instance.
     """
 
-    config_path = path
-    if config_path is None:
-        env_path = os.environ.get(CONFIG_ENV_VAR)
-        if env_path:
-            config_path = Path(env_path)
-        else:
-            config_path = Path(DEFAULT_CONFIG_FILE)
+    config_path = resolve_config_path(path)
 
     data = _read_toml(config_path)
     base_dir = config_path.parent
@@ -210,6 +332,7 @@ def load_config(path: Optional[Path] = None) -> AppConfig:
     schedule_raw = data.get("schedule")
     history_raw = data.get("history")
     selectors_raw = data.get("selectors")
+    ratelimit_raw = data.get("ratelimit", {})
 
     if not isinstance(playwright_raw, Mapping):
         raise ConfigError("[playwright] section is required in the configuration")
@@ -219,11 +342,22 @@ def load_config(path: Optional[Path] = None) -> AppConfig:
         raise ConfigError("[history] section is required in the configuration")
     if not isinstance(selectors_raw, Mapping):
         raise ConfigError("[selectors] section is required in the configuration")
+    if not isinstance(ratelimit_raw, Mapping):
+        raise ConfigError("[ratelimit] must be a table")
 
     playwright = _load_playwright_config(playwright_raw, base_dir=base_dir)
     schedule = _load_schedule_config(schedule_raw, base_dir=base_dir)
     history = _load_history_config(history_raw, base_dir=base_dir)
     selectors = _load_selectors_config(selectors_raw)
+    ratelimit = _load_ratelimit_config(ratelimit_raw, base_dir=base_dir)
+
+    if playwright.profile_dir is not None:
+        profile_root = playwright.profile_dir.resolve()
+        protected = [config_path, history.csv_path, playwright.storage_state_path]
+        protected += [path for path in (history.rollup_path, history.daily_state_path) if path is not None]
+        for path in protected:
+            if path.resolve().is_relative_to(profile_root):
+                raise ConfigError(f"playwright.profile_dir must not contain {path}; use a dedicated directory")
 
     # Ensure parent directories exist for persistence paths.
     history.csv_path.parent.mkdir(parents=True, exist_ok=True)
@@ -234,4 +368,78 @@ def load_config(path: Optional[Path] = None) -> AppConfig:
         schedule=schedule,
         history=history,
         selectors=selectors,
+        ratelimit=ratelimit,
     )
+
+
+@dataclass(frozen=True)
+class ConfigChange:
+    """A validated configuration swap and the top level sections it touched."""
+
+    old: AppConfig
+    new: AppConfig
+    sections: FrozenSet[str]
+
+
+class ConfigWatcher:
+    """Poll ``config.toml`` and swap in new versions once they validate.
+
+    The current :class:`AppConfig` is replaced as a whole, never mutated, so
+    callers that captured a snapshot keep using it until they finish.
+    """
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self.path = resolve_config_path(path)
+        self._lock = threading.Lock()
+        self._signature = self._stat()
+        self._digest = self._hash()
+        self._current = load_config(self.path)
+        self.last_error: Optional[ConfigError] = None
+
+    @property
+    def current(self) -> AppConfig:
+        with self._lock:
+            return self._current
+
+    def poll(self) -> Optional[ConfigChange]:
+        """Reload the file if it changed; return the change or ``None``.
+
+        Invalid versions are rejected, recorded in :attr:`last_error` and the
+        previous configuration stays active.
+        """
+
+        signature = self._stat()
+        if signature == self._signature:
+            return None
+        self._signature = signature
+        digest = self._hash()
+        if digest == self._digest:
+            return None
+        try:
+            new = load_config(self.path)
+        except (ConfigError, ValueError, TypeError) as exc:
+            self.last_error = exc if isinstance(exc, ConfigError) else ConfigError(str(exc))
+            return None
+        self._digest = digest
+        self.last_error = None
+        with self._lock:
+            old, self._current = self._current, new
+        sections = frozenset(
+            item.name for item in fields(AppConfig) if getattr(old, item.name) != getattr(new, item.name)
+        )
+        if not sections:
+            return None
+        return ConfigChange(old=old, new=new, sections=sections)
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _hash(self) -> Optional[str]:
+        try:
+            return hashlib.sha256(self.path.read_bytes()).hexdigest()
+        except FileNotFoundError:
+            return None
@@ -1,12 +1,20 @@
 """History persistence utilities."""
 from __future__ import annotations
 
+import asyncio
 import csv
-from dataclasses import dataclass
+import io
+import json
+import os
+import signal
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date, timedelta
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
 
-from .utils import ensure_parent_dir, json_dumps
+from .utils import atomic_write_text, ensure_parent_dir, json_dumps
 
 
 HISTORY_HEADERS = [
@@ -36,6 +44,12 @@ class HistoryEntry:
     duration_ms: Optional[int] = None
     extra: Optional[dict] = None
 
+    @property
+    def day(self) -> str:
+        """Local calendar day (``YYYY-MM-DD``) of the entry timestamp."""
+
+        return self.timestamp[:10]
+
     def as_row(self) -> List[str]:
         record = {
             "timestamp": self.timestamp,
@@ -50,59 +64,530 @@ class HistoryEntry:
         }
         return [record[key] for key in HISTORY_HEADERS]
 
+    @classmethod
+    def from_row(cls, row: Mapping[str, str]) -> "HistoryEntry":
+        return cls(
+            timestamp=row.get("timestamp", ""),
+            slot=row.get("slot") or None,
+            stage=row.get("stage", ""),
+            result=row.get("result", ""),
+            err_category=row.get("err_category") or None,
+            err_summary=row.get("err_summary") or None,
+            http_status=int(row["http_status"]) if row.get("http_status") else None,
+            duration_ms=int(row["duration_ms"]) if row.get("duration_ms") else None,
+            extra=None,
+        )
+
+
+RollupKey = Tuple[str, str, str]
+
+
+@dataclass
+class HistoryRollup:
+    """Aggregated history for a single day, slot and stage."""
+
+    day: str
+    slot: Optional[str]
+    stage: str
+    count: int = 0
+    results: Dict[str, int] = field(default_factory=dict)
+    err_categories: Dict[str, int] = field(default_factory=dict)
+    duration_count: int = 0
+    duration_total_ms: int = 0
+    duration_min_ms: Optional[int] = None
+    duration_max_ms: Optional[int] = None
+
+    @property
+    def key(self) -> RollupKey:
+        return (self.day, self.slot or "", self.stage)
+
+    @property
+    def duration_avg_ms(self) -> Optional[int]:
+        if not self.duration_count:
+            return None
+        return int(self.duration_total_ms / self.duration_count)
+
+    def add(self, entry: HistoryEntry) -> None:
+        self.count += 1
+        self.results[entry.result] = self.results.get(entry.result, 0) + 1
+        if entry.err_category:
+            self.err_categories[entry.err_category] = self.err_categories.get(entry.err_category, 0) + 1
+        if entry.duration_ms is not None:
+            self._add_durations(1, entry.duration_ms, entry.duration_ms, entry.duration_ms)
+
+    def merge(self, other: "HistoryRollup") -> None:
+        self.count += other.count
+        for name, value in other.results.items():
+            self.results[name] = self.results.get(name, 0) + value
+        for name, value in other.err_categories.items():
+            self.err_categories[name] = self.err_categories.get(name, 0) + value
+        if other.duration_count:
+            self._add_durations(
+                other.duration_count,
+                other.duration_total_ms,
+                other.duration_min_ms,
+                other.duration_max_ms,
+            )
+
+    def _add_durations(self, count: int, total: int, low: Optional[int], high: Optional[int]) -> None:
+        self.duration_count += count
+        self.duration_total_ms += total
+        if low is not None:
+            self.duration_min_ms = low if self.duration_min_ms is None else min(self.duration_min_ms, low)
+        if high is not None:
+            self.duration_max_ms = high if self.duration_max_ms is None else max(self.duration_max_ms, high)
+
+    def as_dict(self) -> dict:
+        return {
+            "day": self.day,
+            "slot": self.slot,
+            "stage": self.stage,
+            "count": self.count,
+            "results": dict(self.results),
+            "err_categories": dict(self.err_categories),
+            "duration_count": self.duration_count,
+            "duration_total_ms": self.duration_total_ms,
+            "duration_min_ms": self.duration_min_ms,
+            "duration_max_ms": self.duration_max_ms,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "HistoryRollup":
+        return cls(
+            day=str(data["day"]),
+            slot=str(data["slot"]) if data.get("slot") else None,
+            stage=str(data.get("stage", "")),
+            count=int(data.get("count", 0)),
+            results={str(k): int(v) for k, v in (data.get("results") or {}).items()},
+            err_categories={str(k): int(v) for k, v in (data.get("err_categories") or {}).items()},
+            duration_count=int(data.get("duration_count", 0)),
+            duration_total_ms=int(data.get("duration_total_ms", 0)),
+            duration_min_ms=data.get("duration_min_ms"),
+            duration_max_ms=data.get("duration_max_ms"),
+        )
+
+
+def fold_entries(entries: Iterable[HistoryEntry], rollups: Optional[Dict[RollupKey, HistoryRollup]] = None) -> Dict[RollupKey, HistoryRollup]:
+    """Fold raw entries into per-day, per-slot, per-stage rollups."""
+
+    folded: Dict[RollupKey, HistoryRollup] = rollups if rollups is not None else {}
+    for entry in entries:
+        key = (entry.day, entry.slot or "", entry.stage)
+        rollup = folded.get(key)
+        if rollup is None:
+            rollup = folded[key] = HistoryRollup(day=entry.day, slot=entry.slot, stage=entry.stage)
+        rollup.add(entry)
+    return folded
+
+
+@dataclass
+class DayStatus:
+    """Sign-in status of a single day as kept in ``daily_state.json``."""
+
+    date: str
+    first_success_time: Optional[str] = None
+    fail_count: int = 0
+    last_result: Optional[str] = None
+    last_time: Optional[str] = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.first_success_time is not None
+
+
+class DailyStateIndex:
+    """Per-day sign-in status keyed by date, so lookups never scan the CSV."""
+
+    def __init__(self, path: Path, keep_days: int = 31) -> None:
+        self.path = path
+        self.keep_days = keep_days
+
+    def get(self, day: str) -> Optional[DayStatus]:
+        data = self._load().get(day)
+        if data is None:
+            return None
+        return DayStatus(
+            date=day,
+            first_success_time=data.get("first_success_time"),
+            fail_count=int(data.get("fail_count", 0)),
+            last_result=data.get("last_result"),
+            last_time=data.get("last_time"),
+        )
+
+    def record(self, entries: Iterable[HistoryEntry]) -> None:
+        """Fold sign-in ``entries`` into the index with a single rewrite."""
+
+        signins = [entry for entry in entries if entry.stage == "signin"]
+        if not signins:
+            return
+        days = self._load()
+        for entry in signins:
+            status = days.setdefault(entry.day, {"fail_count": 0})
+            if entry.result in ("success", "already"):
+                status.setdefault("first_success_time", entry.timestamp)
+            elif entry.result == "failure":
+                status["fail_count"] = int(status.get("fail_count", 0)) + 1
+            status["last_result"] = entry.result
+            status["last_time"] = entry.timestamp
+        kept = dict(sorted(days.items())[-self.keep_days :]) if self.keep_days > 0 else days
+        atomic_write_text(self.path, json_dumps({"days": kept}))
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not self.path.exists():
+            return {}
+        try:
+            return dict(json.loads(self.path.read_text(encoding="utf-8")).get("days", {}))
+        except (json.JSONDecodeError, AttributeError):
+            return {}
+
+
+class RollupError(ValueError):
+    """Raised when the rollup file exists but cannot be parsed."""
+
+
+def _folded_prefix(rows: Sequence[Sequence[str]], folded_through: Optional[Sequence[str]]) -> int:
+    """Return how many leading ``rows`` are already counted in the rollups.
+
+    ``folded_through`` is the last row folded by a compaction. It is only still
+    present when the CSV rewrite following that compaction never happened.
+    """
+
+    if not folded_through:
+        return 0
+    marker = list(folded_through)
+    for index, row in enumerate(rows):
+        if row == marker:
+            return index + 1
+    return 0
+
 
 class HistoryLogger:
-    """Persist history entries to a CSV file."""
+    """Persist history entries to a CSV file.
+
+    When ``rollup_path`` is set, rows older than ``retention_days`` (and rows
+    pushed out by the ``max_rows`` limit) are folded into daily rollups
+    instead of being discarded. The rollup file records the last row it
+    folded, so rows left in the CSV by an interrupted compaction are never
+    counted twice.
+
+    Appends do not re-read the CSV: it is compacted on the first append of
+    each day (when the retention cutoff moves) and whenever the row count
+    tracked since then exceeds ``max_rows`` by more than 10%.
+    """
 
-    def __init__(self, path: Path, max_rows: int = 2000) -> None:
+    def __init__(
+        self,
+        path: Path,
+        max_rows: int = 2000,
+        *,
+        retention_days: int = 0,
+        rollup_path: Optional[Path] = None,
+        daily_state_path: Optional[Path] = None,
+    ) -> None:
         self.path = path
         self.max_rows = max_rows
+        self.retention_days = retention_days
+        self.rollup_path = rollup_path
+        self.daily_state = DailyStateIndex(daily_state_path) if daily_state_path is not None else None
+        self._row_count: Optional[int] = None
+        self._compacted_on: Optional[str] = None
         ensure_parent_dir(self.path)
         if not self.path.exists():
             with self.path.open("w", newline="", encoding="utf-8") as fh:
                 writer = csv.writer(fh)
                 writer.writerow(HISTORY_HEADERS)
 
-    def append(self, entry: HistoryEntry) -> None:
+    def append(self, entry: HistoryEntry, *, fsync: bool = False) -> None:
+        self.append_many([entry], fsync=fsync)
+
+    def append_many(self, entries: Sequence[HistoryEntry], *, fsync: bool = False) -> None:
+        """Write ``entries`` with a single open/write and optional fsync."""
+
+        if not entries:
+            return
         with self.path.open("a", newline="", encoding="utf-8") as fh:
             writer = csv.writer(fh)
-            writer.writerow(entry.as_row())
-        self._truncate_if_needed()
+            writer.writerows(entry.as_row() for entry in entries)
+            if fsync:
+                fh.flush()
+                os.fsync(fh.fileno())
+        if self.daily_state is not None:
+            self.daily_state.record(entries)
+        if self._row_count is not None:
+            self._row_count += len(entries)
+        if self._needs_compaction(entries[-1].day):
+            self._compact_if_needed(entries[-1].day, fsync=fsync)
+
+    def day_status(self, day: str) -> Optional[DayStatus]:
+        """Return the indexed sign-in status for ``day`` (``YYYY-MM-DD``)."""
+
+        if self.daily_state is None:
+            return None
+        return self.daily_state.get(day)
 
     def tail(self, limit: int = 20) -> List[HistoryEntry]:
         if limit <= 0:
             return []
-        entries: List[HistoryEntry] = []
+        return self._read_entries()[-limit:]
+
+    def stats(self, since: Optional[str] = None) -> List[HistoryRollup]:
+        """Return daily rollups merged from compacted and raw history.
+
+        Args:
+            since: Optional ``YYYY-MM-DD`` lower bound (inclusive).
+        """
+
+        try:
+            rollups, folded_through = self._load_rollups()
+        except RollupError as exc:
+            print(f"{exc}; showing raw history only")
+            rollups, folded_through = {}, None
+        header, rows = self._read_rows()
+        pending = rows[_folded_prefix(rows, folded_through) :]
+        fold_entries((HistoryEntry.from_row(dict(zip(header, row))) for row in pending), rollups)
+        selected = [rollup for rollup in rollups.values() if since is None or rollup.day >= since]
+        return sorted(selected, key=lambda rollup: rollup.key)
+
+    def compact(self, today: date, *, fsync: bool = False) -> int:
+        """Fold rows older than the retention window into rollups.
+
+        Args:
+            today: Day the retention window is measured from.
+            fsync: Flush the rewritten CSV to disk before it replaces the old one.
+
+        Returns:
+            Number of raw rows removed from the CSV file.
+        """
+
+        return self._compact_if_needed(today.isoformat(), fsync=fsync)
+
+    def _read_entries(self) -> List[HistoryEntry]:
         if not self.path.exists():
-            return entries
+            return []
         with self.path.open("r", newline="", encoding="utf-8") as fh:
-            reader = csv.DictReader(fh)
-            for row in reader:
-                entries.append(
-                    HistoryEntry(
-                        timestamp=row.get("timestamp", ""),
-                        slot=row.get("slot") or None,
-                        stage=row.get("stage", ""),
-                        result=row.get("result", ""),
-                        err_category=row.get("err_category") or None,
-                        err_summary=row.get("err_summary") or None,
-                        http_status=int(row["http_status"]) if row.get("http_status") else None,
-                        duration_ms=int(row["duration_ms"]) if row.get("duration_ms") else None,
-                        extra=None,
-                    )
-                )
-        return entries[-limit:]
-
-    def _truncate_if_needed(self) -> None:
-        if self.max_rows <= 0:
-            return
+            return [HistoryEntry.from_row(row) for row in csv.DictReader(fh)]
+
+    def _read_rows(self) -> Tuple[List[str], List[List[str]]]:
+        if not self.path.exists():
+            return list(HISTORY_HEADERS), []
         with self.path.open("r", newline="", encoding="utf-8") as fh:
             reader = list(csv.reader(fh))
+        if not reader:
+            return list(HISTORY_HEADERS), []
         header, *rows = reader
-        if len(rows) <= self.max_rows:
+        return header, rows
+
+    def _load_rollups(self) -> Tuple[Dict[RollupKey, HistoryRollup], Optional[List[str]]]:
+        """Return the stored rollups and the last CSV row folded into them.
+
+        Raises:
+            RollupError: If the rollup file exists but is unreadable.
+        """
+
+        if self.rollup_path is None or not self.rollup_path.exists():
+            return {}, None
+        try:
+            payload = json.loads(self.rollup_path.read_text(encoding="utf-8"))
+            rollups = [HistoryRollup.from_dict(item) for item in payload.get("rollups", [])]
+            folded_through = payload.get("folded_through")
+            if folded_through is not None:
+                folded_through = [str(value) for value in folded_through]
+        except (json.JSONDecodeError, AttributeError, KeyError, TypeError, ValueError) as exc:
+            raise RollupError(f"History rollups at {self.rollup_path} are unreadable: {exc}") from exc
+        return {rollup.key: rollup for rollup in rollups}, folded_through
+
+    def _load_rollups_for_compaction(self) -> Tuple[Dict[RollupKey, HistoryRollup], Optional[List[str]]]:
+        try:
+            return self._load_rollups()
+        except RollupError as exc:
+            # Never overwrite unreadable rollups: keep them aside for manual recovery.
+            assert self.rollup_path is not None
+            aside = self.rollup_path.with_name(f"{self.rollup_path.name}.corrupt-{int(time.time())}")
+            os.replace(self.rollup_path, aside)
+            print(f"{exc}; moved to {aside}")
+            return {}, None
+
+    def _save_rollups(
+        self, rollups: Dict[RollupKey, HistoryRollup], folded_through: List[str], *, fsync: bool = False
+    ) -> None:
+        assert self.rollup_path is not None
+        ordered = [rollups[key].as_dict() for key in sorted(rollups)]
+        payload = {"rollups": ordered, "folded_through": folded_through}
+        atomic_write_text(self.rollup_path, json_dumps(payload), fsync=fsync)
+
+    def _needs_compaction(self, day: str) -> bool:
+        if self._row_count is None or day != self._compacted_on:
+            return True
+        slack = max(1, self.max_rows // 10)
+        return self.max_rows > 0 and self._row_count > self.max_rows + slack
+
+    def _compact_if_needed(self, today: str, *, fsync: bool = False) -> int:
+        header, rows = self._read_rows()
+        self._row_count = len(rows)
+        self._compacted_on = today
+
+        keep_from = 0
+        if self.rollup_path is not None and self.retention_days > 0:
+            cutoff = (date.fromisoformat(today) - timedelta(days=self.retention_days)).isoformat()
+            # Rows are appended chronologically, so expired rows form a prefix.
+            while keep_from < len(rows) and rows[keep_from][0][:10] < cutoff:
+                keep_from += 1
+        if self.max_rows > 0:
+            keep_from = max(keep_from, len(rows) - self.max_rows)
+        if self.rollup_path is not None:
+            rollups, folded_through = self._load_rollups_for_compaction()
+            # Rows an interrupted compaction already folded are dropped, never refolded.
+            folded = _folded_prefix(rows, folded_through)
+            keep_from = max(keep_from, folded)
+            if keep_from > folded:
+                entries = (HistoryEntry.from_row(dict(zip(header, row))) for row in rows[folded:keep_from])
+                # The rollups (with their marker) commit first; the CSV rewrite below
+                # only removes rows the marker already covers.
+                self._save_rollups(fold_entries(entries, rollups), rows[keep_from - 1], fsync=fsync)
+        if keep_from <= 0:
+            return 0
+
+        removed, kept = rows[:keep_from], rows[keep_from:]
+        # Rewrite via rename so a crash leaves either the old or the new file.
+        buffer = io.StringIO(newline="")
+        writer = csv.writer(buffer)
+        writer.writerow(header)
+        writer.writerows(kept)
+        atomic_write_text(self.path, buffer.getvalue(), fsync=fsync)
+        self._row_count = len(kept)
+        return len(removed)
+
+
+DURABILITY_MODES = ("buffered", "fsync")
+
+_STOP = object()
+
+
+class AsyncHistoryWriter:
+    """Group-commit history rows from coroutines through a bounded queue.
+
+    Rows are batched into a single :meth:`HistoryLogger.append_many` call per
+    ``batch_size`` rows or ``flush_interval_ms``, whichever comes first. A full
+    queue blocks :meth:`append` instead of dropping rows. ``durability="fsync"``
+    fsyncs every batch.
+    """
+
+    def __init__(
+        self,
+        logger: HistoryLogger,
+        *,
+        queue_size: int = 1000,
+        batch_size: int = 50,
+        flush_interval_ms: int = 200,
+        durability: str = "buffered",
+    ) -> None:
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode: {durability}")
+        self.logger = logger
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(0, flush_interval_ms) / 1000
+        self.fsync = durability == "fsync"
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size))
+        self._lock = threading.Lock()
+        self._worker: Optional[asyncio.Task] = None
+        self._signals: List[int] = []
+
+    async def __aenter__(self) -> "AsyncHistoryWriter":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.close()
+
+    def start(self) -> None:
+        if self._worker is None:
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def append(self, entry: HistoryEntry) -> None:
+        """Queue ``entry``; waits while the queue is full."""
+
+        if self._worker is None or self._worker.done():
+            raise RuntimeError("AsyncHistoryWriter is not running")
+        await self._queue.put(entry)
+
+    async def flush(self) -> None:
+        """Wait until every queued row has been written."""
+
+        await self._queue.join()
+
+    async def close(self) -> None:
+        """Flush pending rows and stop the background worker."""
+
+        self._remove_signal_handlers()
+        if self._worker is None:
             return
-        trimmed = rows[-self.max_rows :]
-        with self.path.open("w", newline="", encoding="utf-8") as fh:
-            writer = csv.writer(fh)
-            writer.writerow(header)
-            writer.writerows(trimmed)
+        if not self._worker.done():
+            await self._queue.put(_STOP)
+        await self._worker
+        self._worker = None
+
+    def flush_now(self) -> None:
+        """Synchronously write every queued row; used from signal handlers."""
+
+        pending: List[HistoryEntry] = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            self._queue.task_done()
+            if item is _STOP:
+                self._queue.put_nowait(_STOP)
+                break
+            pending.append(item)
+        self._write(pending)
+
+    def install_signal_handlers(self, task: Optional[asyncio.Task] = None) -> None:
+        """Flush on SIGINT/SIGTERM, then cancel ``task`` so cleanup can run."""
+
+        loop = asyncio.get_running_loop()
+
+        def _handle() -> None:
+            self.flush_now()
+            if task is not None:
+                task.cancel()
+
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, _handle)
+            except (NotImplementedError, RuntimeError):  # pragma: no cover - Windows / non-main thread
+                continue
+            self._signals.append(sig)
+
+    def _remove_signal_handlers(self) -> None:
+        loop = asyncio.get_running_loop()
+        for sig in self._signals:
+            loop.remove_signal_handler(sig)
+        self._signals.clear()
+
+    def _write(self, entries: List[HistoryEntry]) -> None:
+        with self._lock:
+            self.logger.append_many(entries, fsync=self.fsync)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1] is not _STOP:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            stopping = batch[-1] is _STOP
+            entries = [item for item in batch if item is not _STOP]
+            try:
+                if entries:
+                    await asyncio.to_thread(self._write, entries)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
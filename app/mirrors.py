@@ -0,0 +1,99 @@
+"""Racing equivalent base URLs and remembering which mirror is fastest."""
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+
+from .utils import atomic_write_text, json_dumps
+
+
+Probe = Callable[[str], Awaitable[None]]
+
+
+@dataclass
+class MirrorStats:
+    """Per-endpoint latency EWMA persisted as JSON."""
+
+    path: Path
+    alpha: float = 0.3
+    latencies: Dict[str, float] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: Path, alpha: float = 0.3) -> "MirrorStats":
+        latencies: Dict[str, float] = {}
+        if path.exists():
+            try:
+                raw = json.loads(path.read_text(encoding="utf-8"))
+                latencies = {str(url): float(value) for url, value in raw.get("ewma_ms", {}).items()}
+            except (json.JSONDecodeError, AttributeError, TypeError, ValueError):
+                latencies = {}
+        return cls(path=path, alpha=alpha, latencies=latencies)
+
+    def record(self, url: str, latency_ms: float) -> None:
+        previous = self.latencies.get(url)
+        if previous is None:
+            self.latencies[url] = latency_ms
+        else:
+            self.latencies[url] = self.alpha * latency_ms + (1 - self.alpha) * previous
+
+    def order(self, urls: Sequence[str]) -> List[str]:
+        """Return ``urls`` best first; unmeasured mirrors rank ahead so they get sampled."""
+
+        return sorted(urls, key=lambda url: self.latencies.get(url, 0.0))
+
+    def save(self) -> None:
+        atomic_write_text(self.path, json_dumps({"ewma_ms": self.latencies}))
+
+
+async def race_mirrors(
+    urls: Sequence[str],
+    probe: Probe,
+    stats: MirrorStats,
+    *,
+    timeout_ms: int,
+    stagger_ms: int = 150,
+) -> str:
+    """Probe ``urls`` concurrently and return the first that answers.
+
+    Mirrors start in EWMA order, each ``stagger_ms`` after the previous one,
+    so the historically fastest mirror gets a head start. Remaining probes are
+    cancelled once one succeeds; failed probes are charged ``timeout_ms``.
+    If every probe fails the best-ranked URL is returned.
+    """
+
+    ordered = stats.order(urls)
+    if len(ordered) <= 1:
+        return ordered[0]
+
+    async def _timed(url: str, delay: float) -> float:
+        await asyncio.sleep(delay)
+        started = time.perf_counter()
+        await asyncio.wait_for(probe(url), timeout_ms / 1000)
+        return (time.perf_counter() - started) * 1000
+
+    tasks = {
+        asyncio.ensure_future(_timed(url, index * stagger_ms / 1000)): url for index, url in enumerate(ordered)
+    }
+    winner: Optional[str] = None
+    pending = set(tasks)
+    try:
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                url = tasks[task]
+                if task.exception() is not None:
+                    stats.record(url, float(timeout_ms))
+                    continue
+                stats.record(url, task.result())
+                if winner is None:
+                    winner = url
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        stats.save()
+    return winner or ordered[0]
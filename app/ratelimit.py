@@ -0,0 +1,160 @@
+"""Per-host token-bucket limiting for sign-in traffic."""
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from .config import RateLimitConfig
+from .utils import atomic_write_text, json_dumps
+
+
+@dataclass
+class TokenBucket:
+    """Classic token bucket whose refill rate halves per backoff level."""
+
+    rate: float
+    burst: int
+    tokens: float
+    updated: float
+    backoff_level: int = 0
+    backoff_until: float = 0.0
+
+    def effective_rate(self, now: float) -> float:
+        if now >= self.backoff_until:
+            self.backoff_level = 0
+        return self.rate / (2 ** self.backoff_level)
+
+    def refill(self, now: float) -> None:
+        elapsed = max(0.0, now - self.updated)
+        self.tokens = min(float(self.burst), self.tokens + elapsed * self.effective_rate(now))
+        self.updated = now
+
+    def reserve(self, now: float) -> float:
+        """Take a token, returning how long the caller must wait for it."""
+
+        self.refill(now)
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.effective_rate(now)
+
+
+class RateLimiter:
+    """Token buckets keyed by host with automatic backoff.
+
+    Backoff state is persisted per host in ``settings.state_path`` so it
+    carries over to the next process, e.g. the next cron run.
+    """
+
+    def __init__(
+        self,
+        settings: RateLimitConfig,
+        clock: Callable[[], float] = time.monotonic,
+        wall_clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.settings = settings
+        self._clock = clock
+        self._wall_clock = wall_clock
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._saved: Dict[str, Tuple[int, float]] = self._load_state()
+
+    @property
+    def enabled(self) -> bool:
+        return self.settings.rate_per_sec > 0
+
+    def configure(self, settings: RateLimitConfig) -> None:
+        """Apply new settings while keeping existing buckets' tokens and backoff."""
+
+        self.settings = settings
+        for bucket in self._buckets.values():
+            bucket.rate = settings.rate_per_sec
+            bucket.burst = settings.burst
+            bucket.tokens = min(bucket.tokens, float(settings.burst))
+
+    def _bucket(self, url: str) -> TokenBucket:
+        host = urlsplit(url).netloc or url
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            now = self._clock()
+            bucket = self._buckets[host] = TokenBucket(
+                rate=self.settings.rate_per_sec,
+                burst=self.settings.burst,
+                tokens=float(self.settings.burst),
+                updated=now,
+            )
+            level, until_wall = self._saved.get(host, (0, 0.0))
+            remaining = until_wall - self._wall_clock()
+            if level > 0 and remaining > 0:
+                # Still backing off from an earlier run: start with an empty bucket.
+                bucket.backoff_level = min(level, self.settings.max_backoff_level)
+                bucket.backoff_until = now + remaining
+                bucket.tokens = 0.0
+        return bucket
+
+    def _load_state(self) -> Dict[str, Tuple[int, float]]:
+        path = self.settings.state_path
+        if path is None or not path.exists():
+            return {}
+        try:
+            raw = json.loads(path.read_text(encoding="utf-8"))
+            return {
+                str(host): (int(item["backoff_level"]), float(item["backoff_until"]))
+                for host, item in raw.get("hosts", {}).items()
+            }
+        except (json.JSONDecodeError, AttributeError, KeyError, TypeError, ValueError):
+            return {}
+
+    def _save_state(self) -> None:
+        path = self.settings.state_path
+        if path is None:
+            return
+        now, wall = self._clock(), self._wall_clock()
+        saved = {host: state for host, state in self._saved.items() if state[1] > wall}
+        for host, bucket in self._buckets.items():
+            if bucket.backoff_level > 0 and bucket.backoff_until > now:
+                saved[host] = (bucket.backoff_level, wall + bucket.backoff_until - now)
+            else:
+                saved.pop(host, None)
+        self._saved = saved
+        hosts = {host: {"backoff_level": level, "backoff_until": until} for host, (level, until) in saved.items()}
+        atomic_write_text(path, json_dumps({"hosts": hosts}))
+
+    async def acquire(self, url: str) -> None:
+        """Wait until a request to ``url``'s host is allowed."""
+
+        if not self.enabled:
+            return
+        delay = self._bucket(url).reserve(self._clock())
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def penalize(self, url: str) -> None:
+        """Halve the host's refill rate for ``backoff_seconds`` (up to ``max_backoff_level``)."""
+
+        if not self.enabled:
+            return
+        now = self._clock()
+        bucket = self._bucket(url)
+        bucket.refill(now)
+        bucket.backoff_level = min(bucket.backoff_level + 1, self.settings.max_backoff_level)
+        bucket.backoff_until = now + self.settings.backoff_seconds
+        bucket.tokens = min(bucket.tokens, 0.0)
+        self._save_state()
+
+
+_LIMITER: Optional[RateLimiter] = None
+
+
+def get_limiter(settings: RateLimitConfig) -> RateLimiter:
+    """Return the process-wide limiter, updated to ``settings``."""
+
+    global _LIMITER
+    if _LIMITER is None:
+        _LIMITER = RateLimiter(settings)
+    elif _LIMITER.settings != settings:
+        _LIMITER.configure(settings)
+    return _LIMITER
@@ -2,10 +2,11 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from typing import Optional
 
 from .config import AppConfig
-from .history import HistoryLogger
-from .signin import SigninOutcome, signin
+from .history import AsyncHistoryWriter, HistoryLogger
+from .signin import SigninOutcome, signin, signin_async
 
 
 @dataclass
@@ -15,5 +16,13 @@ class Runner:
     config: AppConfig
     history: HistoryLogger
 
-    def call_signin(self, slot: str) -> SigninOutcome:
-        return signin(self.config, slot, self.history)
+    def call_signin(self, slot: str, deadline: Optional[float] = None, force: bool = False) -> SigninOutcome:
+        # Bind the current snapshot so a reload mid-run does not affect this attempt.
+        config = self.config
+        return signin(config, slot, self.history, deadline=deadline, force=force)
+
+    async def call_signin_async(
+        self, slot: str, writer: AsyncHistoryWriter, deadline: Optional[float] = None, force: bool = False
+    ) -> SigninOutcome:
+        config = self.config
+        return await signin_async(config, slot, writer, deadline=deadline, force=force)
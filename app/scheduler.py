@@ -1,8 +1,9 @@
-"""Scheduler placeholder implementation."""
+"""In-process scheduling of sign-in slots."""
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Callable, Dict
+from datetime import datetime
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
 
 
 @dataclass
@@ -10,12 +11,86 @@ class ScheduledJob:
     slot: str
     trigger_time: str
     action: Callable[[], None]
+    last_run_day: Optional[str] = None
 
+    def is_due(self, now: datetime) -> bool:
+        """Return ``True`` once the trigger time has passed and the job has not run today."""
 
-def create_jobs(schedule: Dict[str, str], action_factory: Callable[[str], Callable[[], None]]) -> Dict[str, ScheduledJob]:
-    """Create placeholder scheduled jobs dictionary."""
+        return now.strftime("%H:%M") >= self.trigger_time and self.last_run_day != now.date().isoformat()
+
+
+def _new_job(
+    slot: str, trigger_time: str, action: Callable[[], None], now: Optional[datetime]
+) -> ScheduledJob:
+    job = ScheduledJob(slot=slot, trigger_time=trigger_time, action=action)
+    if now is not None and job.is_due(now):
+        # Already past today: wait for tomorrow instead of firing on start-up.
+        job.last_run_day = now.date().isoformat()
+    return job
+
+
+def create_jobs(
+    schedule: Mapping[str, str],
+    action_factory: Callable[[str], Callable[[], None]],
+    now: Optional[datetime] = None,
+) -> Dict[str, ScheduledJob]:
+    """Create scheduled jobs keyed by slot name.
+
+    With ``now``, slots whose trigger time has already passed today are
+    treated as done for today.
+    """
 
     jobs: Dict[str, ScheduledJob] = {}
     for slot, trigger_time in schedule.items():
-        jobs[slot] = ScheduledJob(slot=slot, trigger_time=trigger_time, action=action_factory(slot))
+        jobs[slot] = _new_job(slot, trigger_time, action_factory(slot), now)
     return jobs
+
+
+def sync_jobs(
+    jobs: Dict[str, ScheduledJob],
+    schedule: Mapping[str, str],
+    action_factory: Callable[[str], Callable[[], None]],
+    now: Optional[datetime] = None,
+) -> Tuple[List[str], List[str]]:
+    """Update ``jobs`` in place to match ``schedule``.
+
+    Jobs whose slot and trigger time are unchanged keep their run state. New
+    slots follow the same ``now`` rule as :func:`create_jobs`; rescheduled
+    slots keep the day they last ran.
+
+    Returns:
+        Tuple of (added or rescheduled slots, removed slots).
+    """
+
+    removed = [slot for slot in jobs if slot not in schedule]
+    for slot in removed:
+        del jobs[slot]
+    added: List[str] = []
+    for slot, trigger_time in schedule.items():
+        job = jobs.get(slot)
+        if job is not None and job.trigger_time == trigger_time:
+            continue
+        if job is None:
+            jobs[slot] = _new_job(slot, trigger_time, action_factory(slot), now)
+        else:
+            jobs[slot] = ScheduledJob(
+                slot=slot,
+                trigger_time=trigger_time,
+                action=action_factory(slot),
+                last_run_day=job.last_run_day,
+            )
+        added.append(slot)
+    return added, removed
+
+
+def run_pending(jobs: Mapping[str, ScheduledJob], now: datetime) -> List[str]:
+    """Run every due job once and return the slots that ran."""
+
+    ran: List[str] = []
+    for job in sorted(jobs.values(), key=lambda item: item.trigger_time):
+        if not job.is_due(now):
+            continue
+        job.last_run_day = now.date().isoformat()
+        job.action()
+        ran.append(job.slot)
+    return ran
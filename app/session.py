@@ -0,0 +1,75 @@
+"""Persistence helpers for the Playwright ``storage_state.json`` session file."""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Set
+from urllib.parse import urlsplit
+
+from .utils import atomic_write_text
+
+
+def normalize_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Return ``state`` with cookies and localStorage in a stable order."""
+
+    cookies = sorted(
+        state.get("cookies") or [],
+        key=lambda cookie: (cookie.get("domain", ""), cookie.get("path", ""), cookie.get("name", "")),
+    )
+    origins = [
+        {
+            "origin": origin.get("origin", ""),
+            "localStorage": sorted(origin.get("localStorage") or [], key=lambda item: item.get("name", "")),
+        }
+        for origin in sorted(state.get("origins") or [], key=lambda origin: origin.get("origin", ""))
+    ]
+    return {"cookies": cookies, "origins": origins}
+
+
+def _serialize(state: Dict[str, Any]) -> str:
+    return json.dumps(normalize_state(state), ensure_ascii=False, sort_keys=True, indent=2)
+
+
+def load_storage_state(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def save_storage_state(path: Path, state: Dict[str, Any]) -> bool:
+    """Atomically write ``state`` to ``path`` unless it matches what is on disk.
+
+    Returns:
+        ``True`` if the file was rewritten.
+    """
+
+    current = load_storage_state(path)
+    text = _serialize(state)
+    if current is not None and _serialize(current) == text:
+        return False
+    atomic_write_text(path, text)
+    return True
+
+
+def session_urls(state: Optional[Dict[str, Any]], urls: Sequence[str]) -> List[str]:
+    """Return the ``urls`` whose host is covered by a cookie in ``state``.
+
+    Domain cookies (stored with a leading ``.``) cover the domain and its
+    subdomains; host-only cookies cover their exact host only.
+    """
+
+    exact: Set[str] = set()
+    suffixes: Set[str] = set()
+    for cookie in (state or {}).get("cookies") or []:
+        domain = str(cookie.get("domain", "")).lower()
+        if domain.startswith("."):
+            suffixes.add(domain[1:])
+        elif domain:
+            exact.add(domain)
+    covered: List[str] = []
+    for url in urls:
+        host = (urlsplit(url).hostname or "").lower()
+        if host in exact or any(host == domain or host.endswith("." + domain) for domain in suffixes):
+            covered.append(url)
+    return covered
@@ -5,12 +5,25 @@ import asyncio
 import json
 import time
 from dataclasses import dataclass
-from typing import Optional
-
+from typing import Optional, Sequence
+
+from .bodystore import BodyStore
+from .browser import (
+    MIB,
+    CacheStats,
+    new_run_id,
+    open_signin_context,
+    reap_browsers,
+    start_playwright,
+    track_cache_hits,
+)
 from .config import AppConfig
-from .history import HistoryEntry, HistoryLogger
+from .history import AsyncHistoryWriter, HistoryEntry, HistoryLogger
+from .mirrors import MirrorStats, race_mirrors
+from .ratelimit import get_limiter
 from .selectors import match_any_keyword
-from .utils import ResponseSnapshot, now_local
+from .session import load_storage_state, save_storage_state, session_urls
+from .utils import ResponseSnapshot, now_local, summarize
 
 
 @dataclass
@@ -23,6 +36,8 @@ class SigninOutcome:
     err_summary: Optional[str] = None
     http_status: Optional[int] = None
     response: Optional[ResponseSnapshot] = None
+    cache_hit_bytes: Optional[int] = None
+    storage_state_updated: Optional[bool] = None
 
 
 class SigninError(RuntimeError):
@@ -33,17 +48,22 @@ class AuthInvalidError(SigninError):
     """Raised when the session is considered invalid."""
 
 
+class RiskControlError(SigninError):
+    """Raised when the site throttles or challenges the session."""
+
+
 def _parse_response(snapshot: ResponseSnapshot, config: AppConfig) -> tuple[str, Optional[str]]:
-    """Interpret the API response."""
+    """Interpret the API response and return its status with a short body summary."""
 
     body = snapshot.body or ""
+    summary = summarize(body)
     lowered = body.lower()
     selectors = config.selectors.api
     if selectors.checkin_path_contains and selectors.checkin_path_contains not in snapshot.url:
         return "unknown", "Unexpected API endpoint"
 
     if match_any_keyword(lowered, selectors.already_keywords):
-        return "already", body
+        return "already", summary
 
     try:
         payload = json.loads(body)
@@ -51,20 +71,170 @@ def _parse_response(snapshot: ResponseSnapshot, config: AppConfig) -> tuple[str,
         payload = None
 
     if payload and any(str(payload.get(key, "")).lower() in {"true", "ok", "success"} for key in selectors.success_keys):
-        return "success", body
+        return "success", summary
 
     if payload and any(match_any_keyword(str(payload.get(key, "")), selectors.already_keywords) for key in selectors.success_keys):
-        return "already", body
+        return "already", summary
 
     if match_any_keyword(lowered, selectors.success_keys):
-        return "success", body
+        return "success", summary
+
+    return "failure", summary
+
+
+async def _visible_text(page) -> str:
+    """Return the rendered text of the page body, ignoring markup, scripts and attributes."""
+
+    from playwright.async_api import Error as PlaywrightError
+
+    try:
+        return await page.inner_text("body")
+    except PlaywrightError:
+        return ""
+
+
+async def _snapshot_response(response, config: AppConfig, body_store: Optional[BodyStore]) -> ResponseSnapshot:
+    """Snapshot ``response`` and store at most ``history.body_max_bytes`` of it by hash.
+
+    ``response.body()`` still loads the whole body into memory; the cap only
+    limits what is persisted. The full text is kept on the snapshot for
+    :func:`_parse_response`, so large responses are still classified correctly.
+    """
+
+    snapshot = ResponseSnapshot(url=response.url, status=response.status)
+    try:
+        data = await response.body()
+    except Exception:  # pragma: no cover - defensive
+        return snapshot
+    snapshot.body = data.decode("utf-8", errors="replace")
+    limit = config.history.body_max_bytes
+    if len(data) > limit:
+        data = data[:limit]
+        snapshot.truncated = True
+    if body_store is not None and data:
+        snapshot.body_sha256 = body_store.put(data)
+    return snapshot
+
+
+async def _pick_mirror(playwright, config: AppConfig, urls: Sequence[str], deadline: float) -> str:
+    """Race ``urls`` with HEAD probes and return the winner."""
+
+    settings = config.playwright
+    assert settings.mirror_stats_path is not None
+    stats = MirrorStats.load(settings.mirror_stats_path)
+    request = await playwright.request.new_context()
+    timeout_ms = _remaining_ms(deadline, settings.probe_timeout_ms)
+
+    async def probe(url: str) -> None:
+        response = await request.head(url, timeout=timeout_ms, max_redirects=0)
+        if response.status >= 500:
+            raise SigninError(f"Mirror {url} answered HTTP {response.status}")
+
+    try:
+        return await race_mirrors(urls, probe, stats, timeout_ms=timeout_ms)
+    finally:
+        await request.dispose()
+
+
+def _remaining_ms(deadline: float, cap: int) -> int:
+    """Return milliseconds left before ``deadline`` (loop time), capped at ``cap``."""
+
+    remaining = int((deadline - asyncio.get_running_loop().time()) * 1000)
+    return max(1, min(cap, remaining))
+
+
+def new_history_writer(config: AppConfig, history: HistoryLogger) -> AsyncHistoryWriter:
+    """Create the history writer configured by ``[history]``."""
+
+    return AsyncHistoryWriter(
+        history,
+        queue_size=config.history.writer_queue_size,
+        batch_size=config.history.writer_batch_size,
+        flush_interval_ms=config.history.writer_flush_interval_ms,
+        durability=config.history.durability,
+    )
+
+
+async def _record_failure(
+    config: AppConfig, slot: str, writer: AsyncHistoryWriter, err_category: str, message: str
+) -> SigninOutcome:
+    await writer.append(
+        HistoryEntry(
+            timestamp=now_local(config.schedule.timezone).isoformat(),
+            slot=slot,
+            stage="signin",
+            result="failure",
+            err_category=err_category,
+            err_summary=message,
+        )
+    )
+    return SigninOutcome(status="failure", message=message, err_category=err_category, err_summary=message)
+
+
+async def signin_async(
+    config: AppConfig,
+    slot: str,
+    writer: AsyncHistoryWriter,
+    *,
+    deadline: Optional[float] = None,
+    force: bool = False,
+) -> SigninOutcome:
+    """Run one sign-in and record its history row through ``writer``.
+
+    Several calls may share one writer (the ``schedule`` daemon runs every
+    slot through a single writer); browsers are tagged per run, so a run
+    that times out only kills its own browser.
+
+    Args:
+        deadline: Optional absolute :func:`time.monotonic` deadline (e.g. the
+            slot deadline); the run also honours ``playwright.run_timeout_ms``.
+        force: Launch the browser even if today's sign-in already succeeded.
+    """
+
+    if not force:
+        now = now_local(config.schedule.timezone)
+        status = writer.logger.day_status(now.date().isoformat())
+        if status is not None and status.succeeded:
+            message = "already (cached)"
+            await writer.append(
+                HistoryEntry(
+                    timestamp=now.isoformat(),
+                    slot=slot,
+                    stage="signin",
+                    result="already",
+                    err_summary=message,
+                    duration_ms=0,
+                    extra={"cached": True, "first_success_time": status.first_success_time},
+                )
+            )
+            return SigninOutcome(status="already", message=message)
 
-    return "failure", body
+    run_deadline = asyncio.get_running_loop().time() + config.playwright.run_timeout_ms / 1000
+    if deadline is not None:
+        run_deadline = min(run_deadline, deadline)
+    run_id = new_run_id()
+    try:
+        async with asyncio.timeout_at(run_deadline):
+            return await _attempt_signin(config, slot, writer, run_deadline, run_id)
+    except ModuleNotFoundError:  # Playwright missing
+        message = "playwright is not installed. Run 'pip install -r requirements.txt' and 'playwright install chromium'."
+        return await _record_failure(config, slot, writer, "dependency_missing", message)
+    except AuthInvalidError as exc:
+        return await _record_failure(config, slot, writer, "auth_invalid", str(exc))
+    except RiskControlError as exc:
+        return await _record_failure(config, slot, writer, "risk_control", str(exc))
+    except TimeoutError:
+        reap_browsers(own_run=run_id)
+        message = "Sign-in exceeded its deadline and was cancelled"
+        return await _record_failure(config, slot, writer, "timeout", message)
+    except Exception as exc:
+        return await _record_failure(config, slot, writer, "unknown", str(exc))
 
 
-async def _signin_async(config: AppConfig, slot: str, history: HistoryLogger):
+async def _attempt_signin(
+    config: AppConfig, slot: str, writer: AsyncHistoryWriter, deadline: float, run_id: str
+) -> SigninOutcome:
     from playwright.async_api import Error as PlaywrightError
-    from playwright.async_api import async_playwright
 
     storage_path = config.playwright.storage_state_path
     if not storage_path.exists():
@@ -73,34 +243,68 @@ async def _signin_async(config: AppConfig, slot: str, history: HistoryLogger):
     timestamp = now_local(config.schedule.timezone).isoformat()
     start = time.perf_counter()
     outcome = SigninOutcome(status="failure", message="Unknown error", err_category="unknown")
-
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=config.playwright.headless, slow_mo=config.playwright.slow_mo_ms)
-        context = await browser.new_context(storage_state=str(storage_path))
-        page = await context.new_page()
-        captured: Optional[ResponseSnapshot] = None
-
-        async def capture_response(response) -> None:
-            nonlocal captured
-            selectors = config.selectors.api
-            if not selectors.checkin_path_contains:
-                return
-            if selectors.checkin_path_contains in response.url:
-                body_text: Optional[str]
-                try:
-                    body_text = await response.text()
-                except Exception:  # pragma: no cover - defensive
-                    body_text = None
-                captured = ResponseSnapshot(url=response.url, status=response.status, body=body_text)
-
-        page.on("response", capture_response)
-
-        try:
-            await page.goto(config.playwright.base_url, wait_until="domcontentloaded")
+    cache_stats: Optional[CacheStats] = None
+    limiter = get_limiter(config.ratelimit)
+    body_store: Optional[BodyStore] = None
+    if config.history.body_store_dir is not None:
+        body_store = BodyStore(config.history.body_store_dir, config.history.body_store_max_mb * MIB)
+
+    reap_browsers()
+    async with start_playwright(config.playwright.close_timeout_ms, run_id) as p:
+        target_url = config.playwright.base_url
+        if len(config.playwright.base_urls) > 1 and config.playwright.mirror_stats_path is not None:
+            # Only mirrors the stored session cookies apply to; others would load logged out.
+            mirrors = session_urls(load_storage_state(storage_path), config.playwright.base_urls)
+            skipped = [url for url in config.playwright.base_urls if url not in mirrors]
+            if skipped:
+                print(f"Skipping mirrors not covered by the stored session: {', '.join(skipped)}")
+            if len(mirrors) > 1:
+                target_url = await _pick_mirror(p, config, mirrors, deadline)
+            elif mirrors:
+                target_url = mirrors[0]
+        async with open_signin_context(p, config.playwright, run_id) as context:
+            page = await context.new_page()
+            if config.playwright.profile_dir is not None:
+                cache_stats = await track_cache_hits(context, page)
+            captured: Optional[ResponseSnapshot] = None
+
+            async def capture_response(response) -> None:
+                nonlocal captured
+                selectors = config.selectors.api
+                if not selectors.checkin_path_contains:
+                    return
+                if selectors.checkin_path_contains in response.url:
+                    captured = await _snapshot_response(response, config, body_store)
+
+            page.on("response", capture_response)
+
+            checkin_path = config.selectors.api.checkin_path_contains
+            if limiter.enabled and checkin_path:
+
+                async def throttle_checkin(route) -> None:
+                    await limiter.acquire(route.request.url)
+                    await route.continue_()
+
+                await page.route(lambda url: checkin_path in url, throttle_checkin)
+
+            await limiter.acquire(target_url)
+            response = await page.goto(
+                target_url,
+                wait_until="domcontentloaded",
+                timeout=_remaining_ms(deadline, config.playwright.launch_timeout_ms),
+            )
+            if response is not None and response.status == 429:
+                limiter.penalize(target_url)
+                raise RiskControlError("HTTP 429 Too Many Requests on navigation")
             if "github.com/login" in page.url:
                 raise AuthInvalidError("Redirected to GitHub login page")
 
             dom_selectors = config.selectors.dom
+            if dom_selectors.risk_keywords and match_any_keyword(
+                await _visible_text(page), dom_selectors.risk_keywords
+            ):
+                limiter.penalize(target_url)
+                raise RiskControlError("Risk-control page detected before check-in")
             if dom_selectors.login_with_github:
                 locator = page.locator(dom_selectors.login_with_github)
                 try:
@@ -120,7 +324,7 @@ async def _signin_async(config: AppConfig, slot: str, history: HistoryLogger):
                     button = page.locator(selector)
                     try:
                         await button.wait_for(
-                            state="visible", timeout=config.playwright.launch_timeout_ms
+                            state="visible", timeout=_remaining_ms(deadline, config.playwright.launch_timeout_ms)
                         )
                         await button.click()
                     except PlaywrightError as exc:
@@ -158,6 +362,16 @@ async def _signin_async(config: AppConfig, slot: str, history: HistoryLogger):
                         response=captured,
                         http_status=captured.status,
                     )
+                elif captured.status == 429:
+                    limiter.penalize(captured.url)
+                    outcome = SigninOutcome(
+                        status="failure",
+                        message="Check-in API rate limited",
+                        err_category="risk_control",
+                        err_summary=message or "HTTP 429 Too Many Requests",
+                        http_status=captured.status,
+                        response=captured,
+                    )
                 else:
                     outcome = SigninOutcome(
                         status="failure",
@@ -172,6 +386,16 @@ async def _signin_async(config: AppConfig, slot: str, history: HistoryLogger):
                     outcome = SigninOutcome(status="success", message="Check-in success (DOM)")
                 elif match_any_keyword(page_content, dom_selectors.already_keywords):
                     outcome = SigninOutcome(status="already", message="Already checked in (DOM)")
+                elif dom_selectors.risk_keywords and match_any_keyword(
+                    await _visible_text(page), dom_selectors.risk_keywords
+                ):
+                    limiter.penalize(target_url)
+                    outcome = SigninOutcome(
+                        status="failure",
+                        message="Detected risk-control page",
+                        err_category="risk_control",
+                        err_summary="risk keyword detected",
+                    )
                 elif match_any_keyword(page_content, dom_selectors.failure_keywords):
                     outcome = SigninOutcome(
                         status="failure",
@@ -187,11 +411,14 @@ async def _signin_async(config: AppConfig, slot: str, history: HistoryLogger):
                         err_summary="No API response and no DOM keywords",
                     )
 
-        finally:
-            await browser.close()
+            if outcome.status in ("success", "already"):
+                # Keep cookies the site rotated or extended during this run.
+                outcome.storage_state_updated = save_storage_state(storage_path, await context.storage_state())
 
+    if cache_stats is not None:
+        outcome.cache_hit_bytes = cache_stats.hit_bytes
     duration_ms = int((time.perf_counter() - start) * 1000)
-    history.append(
+    await writer.append(
         HistoryEntry(
             timestamp=timestamp,
             slot=slot,
@@ -201,54 +428,36 @@ async def _signin_async(config: AppConfig, slot: str, history: HistoryLogger):
             err_summary=outcome.err_summary or outcome.message,
             http_status=outcome.http_status,
             duration_ms=duration_ms,
-            extra={"response": outcome.response.to_json() if outcome.response else None},
+            extra={
+                "response": outcome.response.to_json() if outcome.response else None,
+                "cache_hit_bytes": outcome.cache_hit_bytes,
+                "base_url": target_url,
+                "storage_state_updated": outcome.storage_state_updated,
+            },
         )
     )
     return outcome
 
 
-def signin(config: AppConfig, slot: str, history: HistoryLogger) -> SigninOutcome:
-    """Public entry point for sign-in."""
+def signin(
+    config: AppConfig,
+    slot: str,
+    history: HistoryLogger,
+    *,
+    deadline: Optional[float] = None,
+    force: bool = False,
+) -> SigninOutcome:
+    """Run :func:`signin_async` once with its own history writer.
+
+    SIGINT/SIGTERM flush the queued row before the run is cancelled.
+    """
+
+    async def _run() -> SigninOutcome:
+        async with new_history_writer(config, history) as writer:
+            writer.install_signal_handlers(asyncio.current_task())
+            return await signin_async(config, slot, writer, deadline=deadline, force=force)
 
     try:
-        return asyncio.run(_signin_async(config, slot, history))
-    except ModuleNotFoundError:  # Playwright missing
-        timestamp = now_local(config.schedule.timezone).isoformat()
-        message = "playwright is not installed. Run 'pip install -r requirements.txt' and 'playwright install chromium'."
-        history.append(
-            HistoryEntry(
-                timestamp=timestamp,
-                slot=slot,
-                stage="signin",
-                result="failure",
-                err_category="dependency_missing",
-                err_summary=message,
-            )
-        )
-        return SigninOutcome(status="failure", message=message, err_category="dependency_missing", err_summary=message)
-    except AuthInvalidError as exc:
-        timestamp = now_local(config.schedule.timezone).isoformat()
-        history.append(
-            HistoryEntry(
-                timestamp=timestamp,
-                slot=slot,
-                stage="signin",
-                result="failure",
-                err_category="auth_invalid",
-                err_summary=str(exc),
-            )
-        )
-        return SigninOutcome(status="failure", message=str(exc), err_category="auth_invalid", err_summary=str(exc))
-    except Exception as exc:
-        timestamp = now_local(config.schedule.timezone).isoformat()
-        history.append(
-            HistoryEntry(
-                timestamp=timestamp,
-                slot=slot,
-                stage="signin",
-                result="failure",
-                err_category="unknown",
-                err_summary=str(exc),
-            )
-        )
-        return SigninOutcome(status="failure", message=str(exc), err_category="unknown", err_summary=str(exc))
+        return asyncio.run(_run())
+    except asyncio.CancelledError as exc:
+        raise SystemExit("Sign-in interrupted; pending history rows were flushed") from exc
@@ -3,6 +3,9 @@ from __future__ import annotations
 
 import asyncio
 import json
+import os
+import tempfile
+import threading
 from dataclasses import asdict, dataclass
 from datetime import datetime, timezone
 from pathlib import Path
@@ -17,6 +20,36 @@ def ensure_parent_dir(path: Path) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
 
 
+def atomic_write_bytes(path: Path, data: bytes, *, fsync: bool = False) -> None:
+    """Write ``data`` to ``path`` atomically via a temporary file and rename.
+
+    With ``fsync`` the temporary file is flushed to disk before the rename, so
+    the new content survives a power loss once this returns.
+    """
+
+    ensure_parent_dir(path)
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+            if fsync:
+                fh.flush()
+                os.fsync(fh.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def atomic_write_text(path: Path, text: str, *, fsync: bool = False) -> None:
+    """Write ``text`` to ``path`` atomically as UTF-8."""
+
+    atomic_write_bytes(path, text.encode("utf-8"), fsync=fsync)
+
+
 def now_local(tz_name: str) -> datetime:
     """Return the current time in the given timezone."""
 
@@ -24,6 +57,15 @@ def now_local(tz_name: str) -> datetime:
     return datetime.now(tz=tz)
 
 
+def summarize(text: Optional[str], limit: int = 200) -> str:
+    """Collapse whitespace in ``text`` and cut it to ``limit`` characters."""
+
+    collapsed = " ".join((text or "").split())
+    if len(collapsed) <= limit:
+        return collapsed
+    return collapsed[: max(0, limit - 3)] + "..."
+
+
 def json_dumps(data: Any) -> str:
     """Serialize ``data`` to JSON with deterministic formatting."""
 
@@ -34,19 +76,41 @@ async def wait_for_input(prompt: str) -> str:
     """Wait for user input without blocking the event loop."""
 
     loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, lambda: input(prompt))
+    future: asyncio.Future[str] = loop.create_future()
+
+    def _read() -> None:
+        try:
+            value = input(prompt)
+        except BaseException as exc:  # pragma: no cover - EOF / interrupt
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_exception(exc))
+        else:
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(value))
+
+    # A daemon thread (not the default executor) so a cancelled prompt cannot
+    # keep asyncio.run() waiting on input() at shutdown.
+    threading.Thread(target=_read, daemon=True).start()
+    return await future
 
 
 @dataclass
 class ResponseSnapshot:
-    """Stores a lightweight snapshot of a network response."""
+    """Stores a lightweight snapshot of a network response.
+
+    ``body`` is only used in memory for classification and is kept out of
+    :meth:`to_json`; the stored (possibly truncated) capture is referenced by
+    ``body_sha256``.
+    """
 
     url: str
     status: int
     body: Optional[str] = None
+    body_sha256: Optional[str] = None
+    truncated: bool = False
 
     def to_json(self) -> str:
-        return json_dumps(asdict(self))
+        data = asdict(self)
+        del data["body"]
+        return json_dumps(data)
 
 
 def iter_lower(values: Iterable[str]) -> Iterable[str]: